@@ -45,6 +45,7 @@ from Bio.PDB.Polypeptide import is_aa
 from Bio.PDB.Polypeptide import three_to_one
 from Bio.Seq import Seq
 from pwem import Plugin, MAXIT_HOME
+from pwem.utils import copyFileFast
 from pwem.convert.transformations import translation_from_matrix
 import mmap
 import re
@@ -776,6 +777,53 @@ def fromCIFTommCIF(inFileName, outFileName, log):
     _frombase(inFileName, outFileName, log, 8)
 
 
+def isMmCIF(fileName):
+    """ Return True if the header of the CIF file declares that it
+    conforms to the PDBx/mmCIF dictionary.
+    """
+    try:
+        with open(fileName, 'rb') as f:
+            header = f.read(4096)
+    except OSError:
+        return False
+    return (header.lstrip().startswith(b'data_') and
+            b'_audit_conform.dict_name' in header and
+            b'mmcif_pdbx.dic' in header)
+
+
+def fromCIFTommCIFOrCopy(inFileName, outFileName, log):
+    """ Convert a CIF file into mmCIF using maxit. Files already declaring
+    mmCIF are just copied, avoiding to launch maxit.
+    """
+    if isMmCIF(inFileName):
+        copyFileFast(inFileName, outFileName)
+    else:
+        fromCIFTommCIF(inFileName, outFileName, log)
+
+
+def fromPDBTommCIF(inFileName, outFileName, log):
+    """ Convert a PDB file into mmCIF. If gemmi is available the conversion
+    is done in a single pass without launching any external program,
+    otherwise maxit is called twice (pdb to cif and cif to mmCIF).
+    """
+    try:
+        import gemmi
+    except ImportError:
+        gemmi = None
+
+    if gemmi is not None:
+        log.info('Converting %s to mmCIF with gemmi' % inFileName)
+        structure = gemmi.read_structure(inFileName)
+        structure.setup_entities()
+        structure.make_mmcif_document().write_file(outFileName)
+    else:
+        fromPDBToCIF(inFileName, outFileName, log)
+        try:
+            fromCIFTommCIF(outFileName, outFileName, log)
+        except Exception:
+            pass
+
+
 def retry(runEnvirom, program, args, cwd, listAtomStruct=[], log=None, clean_dir=None):
     try:
         runEnvirom(program, args, cwd=cwd)
@@ -35,6 +35,7 @@ import struct
 from math import isnan
 
 from pyworkflow.utils import getExt
+from pwem.utils import copyFileFast
 from ..emlib.image import ImageHandler
 
 # File formats
@@ -330,12 +331,47 @@ class Ccp4Header:
 
         return fileName
 
+    @classmethod
+    def canCopyFile(cls, inFileName, outFileName):
+        """ Return True if inFileName can be copied into outFileName instead
+        of converted before fixing its header. That is, when both are MRC
+        files and the input holds a single little endian volume (or image)
+        of real or integer mode. Annotated files (e.g. .mrc:mrc stacks read
+        as volumes) and stacks are always converted.
+        """
+        if (getExt(inFileName) not in ['.mrc', '.map'] or
+                getExt(outFileName) != '.mrc'):
+            return False
+
+        # Machine stamp: 0x44 0x41 or 0x44 0x44 for little endian and
+        # 0x11 0x11 for big endian, some programs leave it empty
+        with open(inFileName, 'rb') as f:
+            f.seek(53 * 4)
+            machineStamp = f.read(2)
+        if machineStamp[:1] == b'\x11':
+            return False
+
+        inHeader = cls(inFileName, readHeader=True)
+        nc, nr, ns = inHeader.getDims()
+        # dimensions read with the wrong byte order are negative or huge
+        if not all(0 < d < 2 ** 20 for d in (nc, nr, ns)):
+            return False
+
+        return (inHeader.getHeader()['Mode'] in (0, 1, 2, 6) and
+                inHeader.getGridSampling()[2] == ns)
+
     @classmethod
     def fixFile(cls, inFileName, outFileName, scipionOriginShifts,
-                sampling=1.0, originField=START):
+                sampling=1.0, originField=START, allowCopy=False):
         """ Create new CCP4 binary file and fix its header.
+        If allowCopy is True, MRC inputs that do not need any conversion
+        (see canCopyFile) are just copied, avoiding to load the whole
+        volume in memory.
         """
-        ImageHandler().convert(inFileName, outFileName)
+        if allowCopy and cls.canCopyFile(inFileName, outFileName):
+            copyFileFast(inFileName, outFileName)
+        else:
+            ImageHandler().convert(inFileName, outFileName)
         x, y, z, ndim = ImageHandler().getDimensions(inFileName)
         ccp4header = Ccp4Header(outFileName, readHeader=True)
         ccp4header.setGridSampling(x, y, z)
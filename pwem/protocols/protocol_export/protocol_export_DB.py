@@ -28,16 +28,20 @@
 
 
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
 
 import pyworkflow.protocol.params as params
 from pwem.convert import Ccp4Header
 from pyworkflow import VERSION_1_2
 
-from pwem.convert.atom_struct import fromPDBToCIF, fromCIFTommCIF, \
+from pwem.convert.atom_struct import fromPDBTommCIF, fromCIFTommCIFOrCopy, \
     AtomicStructHandler
-from pwem.emlib.image import ImageHandler
 from pwem.protocols import EMProtocol
 from pwem.objects import FSC
+from pwem.utils import copyFileFast
 from pyworkflow.utils.path import copyFile
 
 class ProtExportDataBases(EMProtocol):
@@ -58,6 +62,7 @@ class ProtExportDataBases(EMProtocol):
     MASKDIR = "masks"
     MASKNAME = "mask_%02d.mrc"
     SYMPLIFIED_STRUCT = "symplified_atom_structure.cif"
+    MAXEXPORTTHREADS = 8
 
     # --------------------------- DEFINE param functions ----------------------
     def _defineParams(self, form):
@@ -126,49 +131,30 @@ class ProtExportDataBases(EMProtocol):
     # --------------------------- STEPS functions -----------------------------
 
     def createDirectoryStep(self, dirPath):
-        try:
-            os.makedirs(dirPath)
-        except OSError:
-            if not os.path.isdir(dirPath):
-                print("Can not create directory %s" % dirPath)
-                raise
+        os.makedirs(dirPath, exist_ok=True)
 
     def exportVolumeStep(self):
-        inVolFileName = self.exportVolume.get().getFileName()
         inVol = self.exportVolume.get()
+        inVolFileName = inVol.getFileName()
         outVolFileName = os.path.join(self.dirName, self.VOLUMENAME)
         shifts = inVol.getOrigin(force=True).getShifts()
         sampling = inVol.getSamplingRate()
 
-        ccp4header = Ccp4Header(inVolFileName)
-        ccp4header.fixFile(inVolFileName, outVolFileName, shifts,
-                           sampling=sampling)
+        Ccp4Header.fixFile(inVolFileName, outVolFileName, shifts,
+                           sampling=sampling, allowCopy=True)
 
         # Do we have half volumes?
-        if self.exportVolume.get().hasHalfMaps():
-            ih = ImageHandler()
-            for counter, half_map in enumerate(
-                    self.exportVolume.get().getHalfMaps().split(','), 1):
+        if inVol.hasHalfMaps():
+            halfMaps = inVol.getHalfMaps().split(',')
+            for counter, half_map in enumerate(halfMaps, 1):
                 outVolFileName = os.path.join(self.dirName,
                              self.HALFVOLUMENAME % counter)
-                ccp4header.fixFile(half_map, outVolFileName, shifts,
-                                   sampling=sampling)
+                Ccp4Header.fixFile(half_map, outVolFileName, shifts,
+                                   sampling=sampling, allowCopy=True)
 
     def exportAdditionalVolumeStep(self):
-        outputDir = os.path.join(self.dirName, self.ADDITIONALVOLUMEDIR)
-        self.createDirectoryStep(outputDir)
-        ih = ImageHandler()
-        for counter, map in enumerate(self.exportAdditionalVolumes, 1):
-            map = map.get()
-            inVolFileName = map.getFileName()
-            outVolFileName = os.path.join(outputDir,
-                                    self.ADDITIONALVOLUMENAME % counter)
-            shifts = map.getOrigin(force=True).getShifts()
-            sampling = map.getSamplingRate()
-
-            ccp4header = Ccp4Header(inVolFileName)
-            ccp4header.fixFile(inVolFileName, outVolFileName, shifts,
-                               sampling=sampling)
+        self._exportMaps(self.exportAdditionalVolumes,
+                         self.ADDITIONALVOLUMEDIR, self.ADDITIONALVOLUMENAME)
 
     def exportFSCStep(self):
         exportFSC = self.exportFSC.get()
@@ -182,34 +168,22 @@ class ProtExportDataBases(EMProtocol):
         for i, exportFSC in enumerate(fscSet, 1):
             x, y = exportFSC.getData()
             fnFSC = os.path.join(dirName, "fsc_%02d.xml" % i)
-            fo = open(fnFSC, "w")
-            fo.write('<fsc title="FSC(%s)" xaxis="Resolution (A-1)" '
-                     'yaxis="Correlation Coefficient">\n' %
-                     os.path.join(dirName, self.VOLUMENAME))
-            for k in range(len(x)):
-                fo.write("<coordinate>\n")
-                fo.write("<x>%f</x>\n" % x[k])
-                fo.write("<y>%f</y>\n" % y[k])
-                fo.write("</coordinate>\n")
-            fo.write("</fsc>\n")
-            fo.close()
+            with open(fnFSC, "w") as fo:
+                # the title holds a path, escape it as an XML attribute
+                fo.write('<fsc title=%s xaxis="Resolution (A-1)" '
+                         'yaxis="Correlation Coefficient">\n' %
+                         quoteattr("FSC(%s)" %
+                                   os.path.join(dirName, self.VOLUMENAME)))
+                # format the whole body with a single call: interleave x and
+                # y values and repeat the coordinate template once per point
+                xy = np.column_stack((np.asarray(x, dtype=np.float64),
+                                      np.asarray(y, dtype=np.float64)))
+                fo.write(("<coordinate>\n<x>%f</x>\n<y>%f</y>\n"
+                          "</coordinate>\n" * len(xy)) % tuple(xy.ravel().tolist()))
+                fo.write("</fsc>\n")
 
     def exportMasksStep(self):
-        outputDir = os.path.join(self.dirName, self.MASKDIR)
-        self.createDirectoryStep(outputDir)
-
-        for counter, mask in enumerate(self.exportMasks, 1):
-            mask = mask.get()
-            inVolFileName = mask.getFileName()
-            outVolFileName = os.path.join(outputDir,
-                                    self.MASKNAME % counter)
-            shifts = mask.getOrigin(force=True).getShifts()
-            sampling = mask.getSamplingRate()
-
-            ccp4header = Ccp4Header(inVolFileName)
-            ccp4header.fixFile(inVolFileName, outVolFileName, shifts,
-                               sampling=sampling)
-
+        self._exportMaps(self.exportMasks, self.MASKDIR, self.MASKNAME)
 
     def exportAtomStructStep(self):
         exportAtomStruct = self.exportAtomStruct.get()
@@ -228,25 +202,16 @@ class ProtExportDataBases(EMProtocol):
         aSH.read(originStructPath)
         aSH.write(destinySympleStructPath)
 
-        # if pdb convert to mmcif calling maxit twice
+        # if pdb convert to mmcif (with gemmi or calling maxit twice)
         if originStructPath.endswith(".pdb"):
-            # convert pdb to cif using maxit program
+            fromPDBTommCIF(originStructPath, destinyStructPath, self._log)
+        # if cif convert to mmcif using maxit (copy it if already mmcif)
+        elif (originStructPath.endswith(".cif") or
+              originStructPath.endswith(".mmcif")):
             log = self._log
-            fromPDBToCIF(originStructPath,
-                        destinyStructPath, log)
             try:
-                # convert cif to mmCIF by using maxit program
-                fromCIFTommCIF(destinyStructPath,
-                            destinyStructPath, log)
-            except Exception as e:
-                pass
-        # if cif convert to mmcif using maxit
-        elif originStructPath.endswith(".cif"):
-            # convert cif to mmCIF by using maxit program
-            log = self._log
-            try:
-                fromCIFTommCIF(originStructPath,
-                               destinyStructPath, log)
+                fromCIFTommCIFOrCopy(originStructPath,
+                                     destinyStructPath, log)
             except Exception as e:
                 pass
 
@@ -254,7 +219,7 @@ class ProtExportDataBases(EMProtocol):
     def exportImageStep(self):
         imageBaseFileName = os.path.basename(self.exportPicture.get())
         outputFile = os.path.join(self.dirName, imageBaseFileName)
-        copyFile(self.exportPicture.get(), outputFile)
+        copyFileFast(self.exportPicture.get(), outputFile)
 
     # --------------------------- INFO functions ------------------------------
     def _validate(self):
@@ -276,3 +241,33 @@ class ProtExportDataBases(EMProtocol):
     def getFnPath(self, label='volume'):
         return os.path.join(self.filesPath.get(),
                             self._getFileName(label))
+
+    def _exportMaps(self, pointerList, dirName, namePattern):
+        """ Export the volumes of pointerList into dirName (inside the
+        export directory) naming them with namePattern % counter.
+        """
+        outputDir = os.path.join(self.dirName, dirName)
+        self.createDirectoryStep(outputDir)
+        self._exportVolumes([(pointer.get(),
+                              os.path.join(outputDir, namePattern % counter))
+                             for counter, pointer in enumerate(pointerList, 1)])
+
+    def _exportVolumes(self, volList):
+        """ Export a list of (volume, outVolFileName) pairs to mrc format
+        fixing their headers. Conversions are mostly I/O bound so they
+        are run concurrently.
+        """
+        nThreads = min(self.MAXEXPORTTHREADS, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=nThreads) as executor:
+            futures = []
+            for vol, outVolFileName in volList:
+                inVolFileName = vol.getFileName()
+                shifts = vol.getOrigin(force=True).getShifts()
+                sampling = vol.getSamplingRate()
+                futures.append(executor.submit(Ccp4Header.fixFile,
+                                               inVolFileName, outVolFileName,
+                                               shifts, sampling=sampling,
+                                               allowCopy=True))
+            for future in as_completed(futures):
+                # raise any error from the conversion threads
+                future.result()
@@ -24,6 +24,8 @@
 # *
 # **************************************************************************
 
+from bisect import bisect_left
+
 from pyworkflow.utils import removeBaseExt
 from pyworkflow.protocol.params import PointerParam
 
@@ -47,6 +49,18 @@ class ProtImportCTF(ProtImportFiles):
     IMPORT_FROM_EMAN2 = 4
     IMPORT_FROM_SCIPION = 5
 
+    # Format guessed from the file extension when importing in auto mode
+    FORMAT_BY_EXT = {'log': IMPORT_FROM_GRIGORIEFF,
+                     'txt': IMPORT_FROM_GRIGORIEFF,
+                     'out': IMPORT_FROM_GRIGORIEFF,
+                     'ctfparam': IMPORT_FROM_XMIPP3,
+                     'json': IMPORT_FROM_EMAN2}
+
+    def __init__(self, **kwargs):
+        ProtImportFiles.__init__(self, **kwargs)
+        self._cachedFiles = None
+        self._formatCache = None
+
     # --------------------------- DEFINE param functions ----------------------
 
     def _defineImportParams(self, form):
@@ -113,6 +127,9 @@ class ProtImportCTF(ProtImportFiles):
     # --------------------------- STEPS functions -----------------------------
     def importCTFStep(self, importFrom):
         """ Copy ctfs matching the filename pattern. """
+        # Glob the pattern once for the whole step (getFormat included)
+        self._cachedFiles = list(self.iterFiles())
+        self._formatCache = None
         ci = self.getImportClass()
 
         inputMics = self.inputMicrographs.get()
@@ -124,54 +141,29 @@ class ProtImportCTF(ProtImportFiles):
 
         createOutputMics = False
         
-        files = [f for f, _ in self.iterFiles()]
+        files = self._getFiles()
         n = len(files)
         if n == 0:
             raise Exception("No files where found in path: '%s'\n"
                             "matching the pattern: '%s'" %
                             (self.filesPath, self.filesPattern))
         print("Matching files: %s" % n)
-        inputMicBases = [removeBaseExt(m.getFileName()) for m in inputMics]
 
-        if len(files) > len(inputMicBases):
+        if n > inputMics.getSize():
             self.warning("WARNING: The number of files matched by your pattern (%d) is larger than "
                          "the number of available micrographs (%d). It is advised to carefully "
                          "review the output of this run or to re-run with a more restrictive pattern."
-                         % (n, len(inputMicBases)))
-
-        def _getMicCTF(mic):
-            micName = mic.getMicName()
-            micBase = removeBaseExt(mic.getFileName())
-            # see if the base name of this mic is contained in other base names
-            micConflicts = [mc for mc in inputMicBases if micBase in mc and micBase != mc]
-            if micConflicts:
-                self.warning('WARNING: Micrograph base name "%s" conflicts with micrograph(s) "%s". '
-                             'Will try to find a unique match...' % (micBase, '", "'.join(micConflicts)))
-                # check which matching file only matches with this mic and not its conflicts
-                goodFnMatches = [f for f in files if micBase in f and not any(c in f for c in micConflicts)]
-                for goodFnMatch in goodFnMatches:
-                    try:
-                        micCtf = ci.importCTF(mic, goodFnMatch)
-                        self.warning("WARNING: Assigned file %s to micrograph %s." % (goodFnMatch, micBase))
-                        return micCtf
-                    except Exception as ex:
-                        self.warning("WARNING: Can't import ctf for micrograph %s from file %s"
-                                     % (micBase, goodFnMatch))
-                        continue
-                else:
-                    return None
-            else:
-                for fileName, fileId in self.iterFiles():
-                    if (fileId == mic.getObjId() or
-                            micBase in fileName or micName in fileName):
-                        return ci.importCTF(mic, fileName)
+                         % (n, inputMics.getSize()))
 
-            return None
         # Check if the CTF import class has a method to retrieve the CTF
         # from a given micrograph. If not, we will try to associated based
         # on matching the filename or id
-        getMicCTF = getattr(ci, 'getMicCTF', None) or _getMicCTF
+        getMicCTF = getattr(ci, 'getMicCTF', None)
+        if getMicCTF is None:
+            getMicCTF = self._getMicCTFMatcher(ci, files, inputMics)
 
+        # Appended items are only inserted in the sets databases, they are
+        # committed at once when the outputs are defined (Set.write)
         for mic in inputMics:
             ctf = getMicCTF(mic)
             if ctf is not None:
@@ -192,6 +184,9 @@ class ProtImportCTF(ProtImportFiles):
         else:
             self._defineCtfRelation(inputMics, ctfSet)
 
+        self._cachedFiles = None
+        self._formatCache = None
+
     # --------------------------- INFO functions ------------------------------
     
     def _summary(self):
@@ -215,21 +210,120 @@ class ProtImportCTF(ProtImportFiles):
     
     def _validate(self):
         errors = []
-        files = [f for f, _ in self.iterFiles()]
-        if not files:
+        # glob again, files may have changed since the last validation
+        if next(self.iterFiles(), None) is None:
             errors.append("No files where found in path: '%s'\n"
                           "matching the pattern: '%s'" % (self.filesPath, self.filesPattern))
         return errors
     
     # --------------------------- UTILS functions -----------------------------
+    def _getFiles(self):
+        """ Return the list of (fileName, fileId) matching the pattern.
+        Inside importCTFStep the list globbed at the start of the step is
+        reused, avoiding globbing the filesystem several times per run.
+        """
+        if self._cachedFiles is None:
+            return list(self.iterFiles())
+        return self._cachedFiles
+
+    def _getMicCTFMatcher(self, ci, files, inputMics):
+        """ Return a function that imports the CTF of a given micrograph
+        from the file matching its id, base name or name.
+        Params:
+            ci: import class used to read the CTF of a file.
+            files: list of (fileName, fileId) matching the pattern.
+            inputMics: micrographs that will be matched.
+        """
+        # base name and name of each micrograph, by micrograph id
+        micNames = {m.getObjId(): (removeBaseExt(m.getFileName()), m.getMicName())
+                    for m in inputMics}
+        inputMicBases = [micBase for micBase, _ in micNames.values()]
+        micKeys = set(inputMicBases)
+        micKeys.update(micName for _, micName in micNames.values() if micName)
+
+        # Index once which micrograph base names (and names) are contained
+        # in each file and in each other base name, so that matching a
+        # micrograph does not require scanning all files and all bases
+        micKeyLengths = {len(k) for k in micKeys}
+        fileKeys = {}  # only for files containing any key
+        filesByKey = {}
+        filesById = {}
+        for i, (fileName, fileId) in enumerate(files):
+            keys = self._findSubstrings(fileName, micKeys, micKeyLengths)
+            if keys:
+                fileKeys[i] = keys
+                for key in keys:
+                    filesByKey.setdefault(key, []).append(i)
+            if fileId is not None:
+                filesById.setdefault(fileId, i)
+
+        # a base can only conflict with longer ones, so only the shorter
+        # lengths are checked (none when all bases have the same length)
+        micBaseSet = set(inputMicBases)
+        micBaseLengths = sorted({len(b) for b in micBaseSet})
+        conflictsByBase = {}
+        for mc in inputMicBases:
+            shorterLengths = micBaseLengths[:bisect_left(micBaseLengths, len(mc))]
+            for base in self._findSubstrings(mc, micBaseSet, shorterLengths):
+                conflictsByBase.setdefault(base, []).append(mc)
+
+        def _getMicCTF(mic):
+            micBase, micName = micNames[mic.getObjId()]
+            # see if the base name of this mic is contained in other base names
+            micConflicts = conflictsByBase.get(micBase, [])
+            if micConflicts:
+                self.warning('WARNING: Micrograph base name "%s" conflicts with micrograph(s) "%s". '
+                             'Will try to find a unique match...' % (micBase, '", "'.join(micConflicts)))
+                # check which matching file only matches with this mic and not its conflicts
+                goodFnMatches = [files[i][0] for i in filesByKey.get(micBase, [])
+                                 if fileKeys[i].isdisjoint(micConflicts)]
+                for goodFnMatch in goodFnMatches:
+                    try:
+                        micCtf = ci.importCTF(mic, goodFnMatch)
+                        self.warning("WARNING: Assigned file %s to micrograph %s." % (goodFnMatch, micBase))
+                        return micCtf
+                    except Exception as ex:
+                        self.warning("WARNING: Can't import ctf for micrograph %s from file %s"
+                                     % (micBase, goodFnMatch))
+                        continue
+                else:
+                    return None
+            else:
+                # take the first file (in pattern order) matching either
+                # the id, the base name or the name of the micrograph
+                candidates = filesByKey.get(micBase, []) + filesByKey.get(micName, [])
+                if mic.getObjId() in filesById:
+                    candidates.append(filesById[mic.getObjId()])
+                if candidates:
+                    return ci.importCTF(mic, files[min(candidates)][0])
+
+            return None
+
+        return _getMicCTF
+
+    @staticmethod
+    def _findSubstrings(text, keys, keyLengths):
+        """ Return the set of keys that are substrings of text.
+        Params:
+            text: string where to look for the keys.
+            keys: set of strings to look for.
+            keyLengths: lengths of the keys to look for.
+        """
+        return {text[i:i + k] for k in keyLengths
+                for i in range(len(text) - k + 1)
+                if text[i:i + k] in keys}
+
     def getFormat(self):
-        for fileName, _ in self.iterFiles():
-            if (fileName.endswith('.log') or 
-                    fileName.endswith('.txt') or
-                    fileName.endswith('.out')):
-                return self.IMPORT_FROM_GRIGORIEFF
-            if fileName.endswith('.ctfparam'):
-                return self.IMPORT_FROM_XMIPP3
-            if fileName.endswith('.json'):
-                return self.IMPORT_FROM_EMAN2
-        return -1
+        if self._formatCache is not None:
+            return self._formatCache
+
+        fileFormat = -1
+        for fileName, _ in self._getFiles():
+            parts = fileName.rsplit('.', 1)
+            if len(parts) == 2 and parts[1] in self.FORMAT_BY_EXT:
+                fileFormat = self.FORMAT_BY_EXT[parts[1]]
+                break
+        # only remember it while the matched files are cached (in the step)
+        if self._cachedFiles is not None:
+            self._formatCache = fileFormat
+        return fileFormat
@@ -24,8 +24,10 @@
 # *
 # **************************************************************************
 #
+import shutil
 from copy import deepcopy
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, mkdtemp
+from unittest.mock import patch
 from collections import Counter
 from urllib.request import urlretrieve
 
@@ -962,3 +964,52 @@ HETATM 5 C CB . PRO B 1 . 1 ? 6.460 21.723 20.211 1.00 22.26 ? ? ? ? ? ? ? 1 PRO
         f.write(CIFString.encode('utf8'))
         f.close()
         cls.CIFFileName = f.name
+
+
+class TestMmCIF(unittest.TestCase):
+    """ Tests the mmCIF detection used to skip maxit """
+    MMCIF_HEADER = (b"data_5NI1\n#\n_entry.id 5NI1\n#\n"
+                    b"_audit_conform.dict_name mmcif_pdbx.dic\n"
+                    b"_audit_conform.dict_version 5.279\n#\n")
+    CIF_HEADER = b"data_5NI1\n#\nloop_\n_atom_site.group_PDB\n"
+
+    def setUp(self):
+        self.tmpDir = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def _writeFile(self, fileName, data):
+        fileName = os.path.join(self.tmpDir, fileName)
+        with open(fileName, 'wb') as f:
+            f.write(data)
+        return fileName
+
+    def testIsMmCIF(self):
+        self.assertTrue(emconv.atom_struct.isMmCIF(
+            self._writeFile('mm.cif', self.MMCIF_HEADER)))
+        self.assertFalse(emconv.atom_struct.isMmCIF(
+            self._writeFile('plain.cif', self.CIF_HEADER)))
+        self.assertFalse(emconv.atom_struct.isMmCIF(
+            self._writeFile('struct.pdb', b"HEADER    EXTRACELLULAR MATRIX\n")))
+        # non utf-8 headers must not raise
+        self.assertFalse(emconv.atom_struct.isMmCIF(
+            self._writeFile('latin1.cif', b"data_x\n_struct.title 'caf\xe9'\n")))
+        self.assertFalse(emconv.atom_struct.isMmCIF(
+            os.path.join(self.tmpDir, 'missing.cif')))
+
+    def testFromCIFTommCIFOrCopy(self):
+        outFileName = os.path.join(self.tmpDir, 'out.cif')
+        mmCIFFileName = self._writeFile('mm.cif', self.MMCIF_HEADER)
+        cifFileName = self._writeFile('plain.cif', self.CIF_HEADER)
+
+        with patch('pwem.convert.atom_struct._frombase') as maxit:
+            emconv.atom_struct.fromCIFTommCIFOrCopy(mmCIFFileName,
+                                                    outFileName, None)
+            maxit.assert_not_called()
+            with open(outFileName, 'rb') as f:
+                self.assertEqual(self.MMCIF_HEADER, f.read())
+
+            emconv.atom_struct.fromCIFTommCIFOrCopy(cifFileName,
+                                                    outFileName, None)
+            maxit.assert_called_once_with(cifFileName, outFileName, None, 8)
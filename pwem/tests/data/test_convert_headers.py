@@ -0,0 +1,127 @@
+# **************************************************************************
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+import pwem.emlib as emlib
+from pwem.convert import Ccp4Header
+from pwem.emlib.image import ImageHandler
+
+
+def writeMrc(fileName, data, mode=2, mz=None, ispg=1, bigEndian=False):
+    """ Write a minimal MRC file with the given (ns, nr, nc) data. """
+    ns, nr, nc = data.shape
+    mz = ns if mz is None else mz
+    order = '>' if bigEndian else '<'
+    header = bytearray(1024)
+    struct.pack_into(order + '10i', header, 0,
+                     nc, nr, ns, mode, 0, 0, 0, nc, nr, mz)
+    struct.pack_into(order + '6f', header, 40,
+                     float(nc), float(nr), float(mz), 90., 90., 90.)
+    struct.pack_into(order + '3i', header, 64, 1, 2, 3)
+    struct.pack_into(order + '3f', header, 76,
+                     data.min(), data.max(), data.mean())
+    struct.pack_into(order + 'i', header, 88, ispg)
+    header[208:212] = b'MAP '
+    header[212:214] = b'\x11\x11' if bigEndian else b'\x44\x44'
+    with open(fileName, 'wb') as f:
+        f.write(header)
+        f.write(data.astype(order + 'f4').tobytes())
+
+
+class TestCcp4Header(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.volume = np.arange(4 * 5 * 6, dtype=np.float32).reshape(4, 5, 6)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def _path(self, fileName):
+        return os.path.join(self.tmpDir, fileName)
+
+    def testCanCopyFile(self):
+        out = self._path('out.mrc')
+        vol = self._path('vol.mrc')
+        writeMrc(vol, self.volume)
+        self.assertTrue(Ccp4Header.canCopyFile(vol, out))
+
+        volMap = self._path('vol.map')
+        writeMrc(volMap, self.volume)
+        self.assertTrue(Ccp4Header.canCopyFile(volMap, out))
+
+        # only into mrc files
+        self.assertFalse(Ccp4Header.canCopyFile(vol, self._path('out.spi')))
+
+        # stacks read as volumes must be converted
+        stack = self._path('stack.mrc')
+        writeMrc(stack, self.volume, mz=1, ispg=0)
+        self.assertFalse(Ccp4Header.canCopyFile(stack, out))
+        self.assertFalse(Ccp4Header.canCopyFile(stack + ':mrc', out))
+
+        bigEndian = self._path('bigEndian.mrc')
+        writeMrc(bigEndian, self.volume, mode=0, bigEndian=True)
+        self.assertFalse(Ccp4Header.canCopyFile(bigEndian, out))
+
+        complexMode = self._path('complex.mrc')
+        writeMrc(complexMode, self.volume, mode=4)
+        self.assertFalse(Ccp4Header.canCopyFile(complexMode, out))
+
+    @unittest.skipIf(getattr(emlib, 'GHOST_ACTIVATED', False),
+                     "Xmipp image library is not available")
+    def testFixFileSameAsConvert(self):
+        vol = self._path('vol.mrc')
+        writeMrc(vol, self.volume)
+        volMap = self._path('vol.map')
+        writeMrc(volMap, self.volume)
+        stack = self._path('stack.mrc')
+        writeMrc(stack, self.volume, mz=1, ispg=0)
+
+        ih = ImageHandler()
+        shifts = (-4., -5., -6.)
+        for inFileName in [vol, volMap, stack + ':mrc']:
+            fixed = self._path('fixed.mrc')
+            converted = self._path('converted.mrc')
+            Ccp4Header.fixFile(inFileName, fixed, shifts, sampling=2.,
+                               allowCopy=True)
+            Ccp4Header.fixFile(inFileName, converted, shifts, sampling=2.)
+
+            self.assertEqual(ih.getDimensions(converted),
+                             ih.getDimensions(fixed), inFileName)
+            fixedHeader = Ccp4Header(fixed, readHeader=True)
+            convertedHeader = Ccp4Header(converted, readHeader=True)
+            for getter in ['getDims', 'getGridSampling', 'getCellDimensions',
+                           'getStartPixel', 'getISPG']:
+                self.assertEqual(getattr(convertedHeader, getter)(),
+                                 getattr(fixedHeader, getter)(),
+                                 "%s differs for %s" % (getter, inFileName))
+            np.testing.assert_array_equal(ih.read(converted).getData(),
+                                          ih.read(fixed).getData())
@@ -0,0 +1,87 @@
+# **************************************************************************
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pwem.utils import copyFileFast
+
+
+class TestCopyFileFast(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpDir, 'source.bin')
+        self.dest = os.path.join(self.tmpDir, 'dest.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def _writeSource(self, data):
+        with open(self.source, 'wb') as f:
+            f.write(data)
+
+    def _readDest(self):
+        with open(self.dest, 'rb') as f:
+            return f.read()
+
+    def testCopy(self):
+        data = os.urandom(3 * 1024 * 1024 + 7)
+        self._writeSource(data)
+        copyFileFast(self.source, self.dest)
+        self.assertEqual(data, self._readDest())
+
+        # overwrite an existing (bigger) destination
+        self._writeSource(b'small')
+        copyFileFast(self.source, self.dest)
+        self.assertEqual(b'small', self._readDest())
+
+    def testEmptyFile(self):
+        self._writeSource(b'')
+        with patch('pwem.utils.shutil.copyfile',
+                   wraps=shutil.copyfile) as copyfile:
+            copyFileFast(self.source, self.dest)
+            copyfile.assert_called_once_with(self.source, self.dest)
+        self.assertEqual(b'', self._readDest())
+
+    def testSameFile(self):
+        self._writeSource(b'data')
+        with self.assertRaises(shutil.SameFileError):
+            copyFileFast(self.source, self.source)
+        with open(self.source, 'rb') as f:
+            self.assertEqual(b'data', f.read())
+
+    def testFallback(self):
+        data = os.urandom(1024)
+        self._writeSource(data)
+        with patch('os.copy_file_range', side_effect=OSError,
+                   create=True), \
+                patch('pwem.utils.shutil.copyfile',
+                      wraps=shutil.copyfile) as copyfile:
+            copyFileFast(self.source, self.dest)
+            copyfile.assert_called_once_with(self.source, self.dest)
+        self.assertEqual(data, self._readDest())
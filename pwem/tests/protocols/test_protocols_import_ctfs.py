@@ -22,10 +22,13 @@
 # ***************************************************************************/
 
 import os
+import unittest
+from unittest.mock import MagicMock
 
 import pyworkflow.utils as pwutils
 import pyworkflow.tests as pwtests
 
+import pwem.objects as emobj
 import pwem.protocols as emprot
 
 
@@ -142,3 +145,60 @@ class TestImportCTFs(pwtests.BaseTest):
 
         self.assertIsNotNone(protCTF.outputCTF,
                              "There was a problem when importing ctfs.")
+
+
+class TestImportCTFMatching(unittest.TestCase):
+    """ Tests the matching of micrographs and ctf files without any data """
+
+    def testFindSubstrings(self):
+        keys = {'mic1', 'mic10', 'mic2', 'BPV_1386'}
+        lengths = {len(k) for k in keys}
+        findSubstrings = emprot.ProtImportCTF._findSubstrings
+        self.assertEqual(findSubstrings('/ctfs/mic10_ctf.txt', keys, lengths),
+                         {'mic1', 'mic10'})
+        self.assertEqual(findSubstrings('/ctfs/BPV_1386.txt', keys, lengths),
+                         {'BPV_1386'})
+        self.assertEqual(findSubstrings('/ctfs/mic3.txt', keys, lengths), set())
+        self.assertEqual(findSubstrings('mic', keys, lengths), set())
+
+    def testGetMicCTFMatcher(self):
+        mics = []
+        for micId, fileName, micName in [(1, '/mics/mic1.mrc', None),
+                                         (2, '/mics/mic10.mrc', None),
+                                         (3, '/mics/stack_a.mrc', None),
+                                         (4, '/mics/other.mrc', 'name4'),
+                                         (5, '/mics/mic5.mrc', None),
+                                         (6, '/mics/missing.mrc', None)]:
+            mic = emobj.Micrograph(location=fileName)
+            mic.setObjId(micId)
+            if micName:
+                mic.setMicName(micName)
+            mics.append(mic)
+
+        # files as provided by iterFiles with a #### pattern (sorted)
+        files = [('/ctfs/a_0003.txt', 3),
+                 ('/ctfs/mic10_0002.txt', 2),
+                 ('/ctfs/mic1_0001.txt', 1),
+                 ('/ctfs/mic5_0008.txt', 8),
+                 ('/ctfs/name4_0007.txt', 7),
+                 ('/ctfs/zz_0005.txt', 5)]
+
+        ci = MagicMock()
+        ci.importCTF.side_effect = lambda mic, fileName: fileName
+        prot = emprot.ProtImportCTF()
+        prot.warning = MagicMock()
+        getMicCTF = prot._getMicCTFMatcher(ci, files, mics)
+
+        matches = [getMicCTF(mic) for mic in mics]
+        self.assertEqual(matches,
+                         [
+                          # mic1 conflicts with mic10, the unique match is used
+                          '/ctfs/mic1_0001.txt',
+                          '/ctfs/mic10_0002.txt',
+                          # no name matches, only the id
+                          '/ctfs/a_0003.txt',
+                          # matched by micrograph name
+                          '/ctfs/name4_0007.txt',
+                          # base name and id match, the first file wins
+                          '/ctfs/mic5_0008.txt',
+                          None])
@@ -24,6 +24,8 @@
 # *  e-mail address 'scipion@cnb.csic.es'
 # *
 # **************************************************************************
+import os
+import shutil
 from os.path import join, dirname, basename
 import pyworkflow.utils as pwutils
 import pwem
@@ -76,6 +78,36 @@ def getCmdPath(*paths):
     return join(getPWEMPath('cmd'), *paths)
 
 
+def copyFileFast(source, dest):
+    """ Copy the content of source into dest letting the kernel do the work.
+    On Linux os.copy_file_range avoids copying the data through user space
+    and on filesystems supporting it (e.g. btrfs, xfs) only clones the
+    blocks (reflink). Otherwise, fall back to shutil.copyfile.
+    """
+    if (hasattr(os, 'copy_file_range') and
+            not (os.path.exists(dest) and os.path.samefile(source, dest))):
+        try:
+            with open(source, 'rb') as fIn:
+                remaining = os.fstat(fIn.fileno()).st_size
+                # empty or special files (e.g. in /proc) may report no size,
+                # leave them to shutil that reads until the end
+                if remaining > 0:
+                    with open(dest, 'wb') as fOut:
+                        while remaining > 0:
+                            copied = os.copy_file_range(fIn.fileno(),
+                                                        fOut.fileno(),
+                                                        remaining)
+                            if copied == 0:
+                                break
+                            remaining -= copied
+                    if remaining == 0:
+                        return
+        except OSError:
+            pass  # e.g. not supported by the filesystem or kernel
+
+    shutil.copyfile(source, dest)
+
+
 def convertPixToLength(samplingRate, length):
     return samplingRate * length
 